@@ -1,35 +1,82 @@
-from fastapi import FastAPI, Request, Query
+from fastapi import FastAPI, Request, Query, Response
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 import discord
 from discord.ext import commands
-import xml.etree.ElementTree as ET
+from lxml import etree as ET
+from xml.sax.saxutils import unescape
 import os
 from dotenv import load_dotenv
-import json
-import requests
+import orjson
+import re
+import httpx
 import asyncio
+import random
 import logging
 import time
 import secrets
-import string
-from collections import defaultdict
+import hmac
+import hashlib
+import queue
+import logging.handlers
+import functools
+import contextlib
+from collections import defaultdict, OrderedDict
 import psutil
 
-# Configure logging with reduced verbosity
+# Log records are only enqueued on the calling thread; the listener does the
+# actual file/console I/O on a background thread so the event loop never
+# blocks on a write() syscall
+_log_queue = queue.Queue(-1)
+_log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+_log_file_handler = logging.FileHandler('app.log', delay=True)
+_log_file_handler.setFormatter(_log_formatter)
+_log_stream_handler = logging.StreamHandler()
+_log_stream_handler.setFormatter(_log_formatter)
 logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('app.log'),
-        logging.StreamHandler()
-    ]
+    level=logging.DEBUG if os.getenv("LOG_LEVEL", "").upper() == "DEBUG" else logging.INFO,
+    handlers=[logging.handlers.QueueHandler(_log_queue)]
+)
+_log_listener = logging.handlers.QueueListener(
+    _log_queue, _log_file_handler, _log_stream_handler
 )
+_log_listener.start()
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+def _log_bot_crash(task):
+    # Surface gateway failures (bad token, network) instead of letting the
+    # fire-and-forget task swallow them while FastAPI keeps serving
+    if not task.cancelled() and task.exception():
+        logger.error("Discord bot task crashed: %s", task.exception())
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    logger.info("Starting FastAPI server and Discord bot")
+    bot_task = asyncio.create_task(bot.start(DISCORD_TOKEN))
+    bot_task.add_done_callback(_log_bot_crash)
+    background = [
+        asyncio.create_task(_flush_accounts()),
+        asyncio.create_task(_sweep_sent_messages()),
+        asyncio.create_task(_sample_stats()),
+    ]
+    yield
+    logger.info("Shutting down Discord bot")
+    for task in background:
+        task.cancel()
+    bot_task.cancel()
+    await bot.close()
+    await client.aclose()
+    if _accounts_dirty.is_set():
+        _write_accounts(YOUTUBE_CHANNELS)
+    _log_listener.stop()
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 load_dotenv()
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
 CHANNEL_ID = int(os.getenv("CHANNEL_ID"))
 WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+# Optional Discord channel webhook; when set, notifications go out as a plain
+# HTTP POST instead of through the gateway client's send path
+DISCORD_WEBHOOK_URL = os.getenv("DISCORD_WEBHOOK_URL")
 
 # Validate environment variables
 if not DISCORD_TOKEN:
@@ -45,313 +92,494 @@ intents.message_content = True
 intents.guilds = True
 bot = commands.Bot(command_prefix="!", intents=intents)
 
-# Message deduplication cache
-sent_messages = defaultdict(list)
+# Message deduplication cache: per-channel dict keyed by message_key for O(1)
+# lookups; a background sweeper drops expired buckets so it stays bounded
+sent_messages = defaultdict(dict)
+
+def _bucket() -> int:
+    # 10-second dedup bucket as an int on the monotonic clock: cheaper to
+    # hash than a float and immune to NTP wall-clock jumps
+    return time.monotonic_ns() // 10_000_000_000
+
+async def _sweep_sent_messages(max_age_buckets=6):
+    while True:
+        await asyncio.sleep(60)
+        cutoff = _bucket() - max_age_buckets
+        for entries in sent_messages.values():
+            stale = [key for key in entries if key[2] < cutoff]
+            for key in stale:
+                del entries[key]
+
+# Server stats cache refreshed by a background sampler so command handlers
+# never walk /proc on the request path
+_stats = {'cpu': 0.0, 'mem': 0.0}
+
+async def _sample_stats():
+    while True:
+        _stats['cpu'] = psutil.cpu_percent(interval=None)
+        _stats['mem'] = psutil.virtual_memory().percent
+        await asyncio.sleep(5)
+
+# Notification channel, resolved once in on_ready so handle_webhook doesn't
+# walk the guild/channel cache on every notification
+_target_channel = None
+
+# Fast path for the tiny, well-formed Atom payloads PubSubHubbub delivers:
+# pull videoId/title straight out of the raw bytes and skip DOM construction.
+# Anything this misses falls back to the full lxml parse.
+_FAST = re.compile(rb"<yt:videoId>([^<]+)</yt:videoId>.*?<title>([^<]+)</title>", re.S)
+
+# Entities beyond the &amp;/&lt;/&gt; that unescape() handles by default,
+# needed so the fast path yields the same text as the lxml parse
+_XML_ENTITIES = {"&apos;": "'", "&quot;": '"'}
+
+# One hardened parser shared across webhook invocations: no per-request
+# parser-context setup, and entity/DTD expansion and network access disabled
+# for untrusted input
+_PARSER = ET.XMLParser(resolve_entities=False, no_network=True, huge_tree=False, recover=False)
+
+# Clark-notation tags precomputed once; iter() early-exits on first match
+# without re-parsing an XPath expression per request
+_VIDEO_TAG = "{http://www.youtube.com/xml/schemas/2015}videoId"
+_TITLE_TAG = "{http://www.w3.org/2005/Atom}title"
+
+# Shared HTTP client so PubSubHubbub calls reuse pooled keep-alive connections
+# instead of opening a fresh TCP+TLS connection per request
+client = httpx.AsyncClient(
+    limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+    timeout=10.0
+)
+
+# Cap concurrent subscription calls so bulk re-checks stay polite to the hub
+_hub_semaphore = asyncio.Semaphore(10)
+
+_HUB_URL = "https://pubsubhubbub.appspot.com/subscribe"
+_TOPIC_PREFIX = "https://www.youtube.com/feeds/videos.xml?channel_id="
+
+def _hub_payload(mode, channel_id):
+    payload = {
+        "hub.mode": mode,
+        "hub.topic": _TOPIC_PREFIX + channel_id,
+        "hub.callback": WEBHOOK_URL,
+        "hub.verify": "async"
+    }
+    if mode == "subscribe":
+        payload["hub.secret"] = HUB_SECRET
+    return payload
 
 def load_accounts():
     try:
-        with open("accounts.json", "r") as f:
-            data = json.load(f)
+        with open("accounts.json", "rb") as f:
+            data = orjson.loads(f.read())
             accounts = data.get("youtube", [])
-            logger.info(f"Loaded {len(accounts)} YouTube channels")
+            logger.info("Loaded %s YouTube channels", len(accounts))
             return accounts
     except FileNotFoundError:
         logger.warning("accounts.json not found, starting with empty list")
         return []
     except Exception as e:
-        logger.error(f"Error loading accounts.json: {e}")
+        logger.error("Error loading accounts.json: %s", e)
         return []
 
-def save_accounts(accounts):
+def _load_hub_secret():
+    try:
+        with open("accounts.json", "rb") as f:
+            secret = orjson.loads(f.read()).get("hub_secret")
+            if secret:
+                return secret
+    except Exception:
+        pass
+    secret = secrets.token_hex(20)
+    logger.info("Generated new hub secret")
+    _accounts_dirty.set()
+    return secret
+
+def _write_accounts(accounts):
     try:
-        with open("accounts.json", "w") as f:
-            json.dump({"youtube": accounts}, f)
+        with open("accounts.json.tmp", "wb") as f:
+            f.write(orjson.dumps({"youtube": sorted(accounts), "hub_secret": HUB_SECRET}))
+        os.replace("accounts.json.tmp", "accounts.json")
         logger.info("Saved accounts.json")
     except Exception as e:
-        logger.error(f"Error saving accounts.json: {e}")
+        logger.error("Error saving accounts.json: %s", e)
+
+_accounts_dirty = asyncio.Event()
+
+def save_accounts(accounts):
+    # Just flag the store as dirty; the background flusher coalesces bursts
+    # of mutations into a single atomic write off the event loop
+    _accounts_dirty.set()
+
+async def _flush_accounts():
+    while True:
+        await _accounts_dirty.wait()
+        await asyncio.sleep(0.5)
+        _accounts_dirty.clear()
+        await asyncio.to_thread(_write_accounts, set(YOUTUBE_CHANNELS))
+
+# Set for O(1) membership tests in the command handlers; serialized as a
+# sorted list at save time
+YOUTUBE_CHANNELS = set(load_accounts())
+
+# Shared secret sent with subscribe requests so the hub signs notifications;
+# unsigned or mismatched bodies are rejected before any XML work
+HUB_SECRET = _load_hub_secret()
+
+def _verify_signature(header, body):
+    if not header:
+        return False
+    method, _, digest = header.partition("=")
+    if method != "sha1":
+        return False
+    expected = hmac.new(HUB_SECRET.encode(), body, hashlib.sha1).hexdigest()
+    return hmac.compare_digest(expected, digest)
+
+def _nonce() -> str:
+    # One urandom read per token instead of a per-character CSPRNG loop
+    return secrets.token_urlsafe(12)
 
-YOUTUBE_CHANNELS = load_accounts()
+def _dedup_command(kind):
+    # Shared prologue for the bot commands: one dedup check per 10-second
+    # bucket, with the generated nonce stashed on the context for the body.
+    # Command arguments are folded into the key so e.g. two different
+    # !monitor invocations don't dedupe each other.
+    def deco(fn):
+        @functools.wraps(fn)
+        async def wrapper(ctx, *args, **kwargs):
+            suffix = "-".join(str(a) for a in args)
+            key_kind = f"{kind}-{suffix}" if suffix else kind
+            message_key = (str(ctx.channel.id), key_kind, _bucket())
+            if message_key in sent_messages[str(ctx.channel.id)]:
+                logger.debug("Skipping duplicate %s command", key_kind)
+                return
+            nonce = _nonce()
+            sent_messages[str(ctx.channel.id)][message_key] = nonce
+            ctx.nonce = nonce
+            return await fn(ctx, *args, **kwargs)
+        return wrapper
+    return deco
 
 @bot.event
 async def on_ready():
-    logger.info(f"Bot logged in as {bot.user} (ID: {bot.user.id})")
+    global _target_channel
+    logger.info("Bot logged in as %s (ID: %s)", bot.user, bot.user.id)
     channel = bot.get_channel(CHANNEL_ID)
+    _target_channel = channel
     if channel:
-        logger.info(f"Found Discord channel {CHANNEL_ID} ({channel.name})")
+        logger.info("Found Discord channel %s (%s)", CHANNEL_ID, channel.name)
     else:
-        logger.error(f"Discord channel {CHANNEL_ID} not found")
-    logger.info(f"FastAPI server ready at {WEBHOOK_URL}")
-    cpu_percent = psutil.cpu_percent()
-    memory = psutil.virtual_memory()
-    logger.info(f"Server status: CPU={cpu_percent}%, Memory={memory.percent}%")
-
-def subscribe_channel(channel_id, retries=3, delay=5):
-    logger.info(f"Subscribing to YouTube channel {channel_id}")
+        logger.error("Discord channel %s not found", CHANNEL_ID)
+    logger.info("FastAPI server ready at %s", WEBHOOK_URL)
+    logger.info("Server status: CPU=%s%%, Memory=%s%%", _stats['cpu'], _stats['mem'])
+
+def _backoff(base, attempt, cap=30):
+    # Exponential backoff with jitter so retries land quickly on transient
+    # failures without holding the command coroutine for the worst case
+    return min(cap, base * 2 ** attempt) + random.uniform(0, 1)
+
+async def subscribe_channel(channel_id, retries=3, delay=5):
+    async with _hub_semaphore:
+        return await _subscribe_channel(channel_id, retries, delay)
+
+async def _subscribe_channel(channel_id, retries, delay):
+    logger.info("Subscribing to YouTube channel %s", channel_id)
     for attempt in range(retries):
         try:
-            response = requests.post(
-                "https://pubsubhubbub.appspot.com/subscribe",
-                data={
-                    "hub.mode": "subscribe",
-                    "hub.topic": f"https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}",
-                    "hub.callback": WEBHOOK_URL,
-                    "hub.verify": "async",
-                    "hub.verify_token": ""
-                },
-                headers={"User-Agent": "YouTubeWebhookBot"},
-                timeout=15
+            response = await client.post(
+                _HUB_URL,
+                data=_hub_payload("subscribe", channel_id),
+                headers={"User-Agent": "YouTubeWebhookBot"}
             )
             lease_seconds = response.headers.get('hub-lease-seconds', 'unknown')
-            logger.info(f"Subscription response: status={response.status_code}, lease_seconds={lease_seconds}, headers={response.headers}")
+            logger.info("Subscription response: status=%s, lease_seconds=%s, headers=%s", response.status_code, lease_seconds, response.headers)
             if response.status_code == 202:
-                logger.info(f"Subscription accepted for {channel_id}, lease_seconds={lease_seconds}")
-                time.sleep(2)
+                logger.info("Subscription accepted for %s, lease_seconds=%s", channel_id, lease_seconds)
                 return True
             else:
-                logger.error(f"Subscription failed for {channel_id}: status={response.status_code}, response={response.text}")
+                logger.error("Subscription failed for %s: status=%s, response=%s", channel_id, response.status_code, response.text)
                 if attempt < retries - 1:
-                    time.sleep(delay)
-        except requests.RequestException as e:
-            logger.error(f"Network error for {channel_id}: {e}")
+                    await asyncio.sleep(_backoff(delay, attempt))
+        except httpx.HTTPError as e:
+            logger.error("Network error for %s: %s", channel_id, e)
             if attempt < retries - 1:
-                time.sleep(delay)
-    logger.error(f"Failed to subscribe to {channel_id} after {retries} attempts")
+                await asyncio.sleep(_backoff(delay, attempt))
+    logger.error("Failed to subscribe to %s after %s attempts", channel_id, retries)
     return False
 
 @bot.command()
+@_dedup_command("ping")
 async def ping(ctx):
-    nonce = ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(16))
-    logger.info(f"Ping command received with nonce {nonce}")
-    message_key = (str(ctx.channel.id), "ping", time.time() // 10)
-    if any(key == message_key for key, _ in sent_messages[str(ctx.channel.id)]):
-        logger.debug(f"Skipping duplicate ping with nonce {nonce}")
-        return
-    sent_messages[str(ctx.channel.id)].append((message_key, nonce))
+    nonce = ctx.nonce
+    logger.info("Ping command received with nonce %s", nonce)
     try:
-        cpu_percent = psutil.cpu_percent()
-        memory = psutil.virtual_memory()
         latency = bot.latency * 1000
         await ctx.send(
-            f"Pong! Bot is online.\nServer: CPU={cpu_percent}%, Memory={memory.percent}% used\nLatency: {latency:.2f}ms",
+            f"Pong! Bot is online.\nServer: CPU={_stats['cpu']}%, Memory={_stats['mem']}% used\nLatency: {latency:.2f}ms",
             nonce=nonce
         )
-        logger.info(f"Ping completed with nonce {nonce}")
+        logger.info("Ping completed with nonce %s", nonce)
     except Exception as e:
-        logger.error(f"Ping failed with nonce {nonce}: {e}")
+        logger.error("Ping failed with nonce %s: %s", nonce, e)
         await ctx.send(f"Ping failed: {e}", nonce=nonce)
 
 @bot.command()
+@_dedup_command("test")
 async def test(ctx):
-    nonce = ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(16))
-    logger.info(f"Test command received with nonce {nonce}")
-    message_key = (str(ctx.channel.id), "test", time.time() // 10)
-    if any(key == message_key for key, _ in sent_messages[str(ctx.channel.id)]):
-        logger.debug(f"Skipping duplicate test with nonce {nonce}")
-        return
-    sent_messages[str(ctx.channel.id)].append((message_key, nonce))
+    nonce = ctx.nonce
+    logger.info("Test command received with nonce %s", nonce)
     try:
         await ctx.send("Bot is online and working! Checking channel access...", nonce=nonce)
         channel = bot.get_channel(CHANNEL_ID)
         if channel:
-            channel_nonce = nonce + "-channel"
-            channel_key = (str(channel.id), "test-channel", time.time() // 10)
-            if any(key == channel_key for key, _ in sent_messages[str(channel.id)]):
-                logger.debug(f"Skipping duplicate channel test with nonce {channel_nonce}")
-                return
-            sent_messages[str(channel.id)].append((channel_key, channel_nonce))
-            await channel.send(f"Test message from bot to confirm access to channel {CHANNEL_ID}", nonce=channel_nonce)
-            success_nonce = nonce + "-success"
-            success_key = (str(ctx.channel.id), "test-success", time.time() // 10)
-            if any(key == success_key for key, _ in sent_messages[str(ctx.channel.id)]):
-                logger.debug(f"Skipping duplicate success test with nonce {success_nonce}")
-                return
-            sent_messages[str(ctx.channel.id)].append((success_key, success_nonce))
-            await ctx.send(f"Successfully sent test message to configured channel {CHANNEL_ID}", nonce=success_nonce)
+            await channel.send(f"Test message from bot to confirm access to channel {CHANNEL_ID}", nonce=nonce + "-channel")
+            await ctx.send(f"Successfully sent test message to configured channel {CHANNEL_ID}", nonce=nonce + "-success")
         else:
             await ctx.send(f"Error: Bot cannot access channel {CHANNEL_ID}", nonce=nonce)
-        logger.info(f"Test completed with nonce {nonce}")
+        logger.info("Test completed with nonce %s", nonce)
     except Exception as e:
-        logger.error(f"Test failed with nonce {nonce}: {e}")
+        logger.error("Test failed with nonce %s: %s", nonce, e)
         await ctx.send(f"Test failed: {e}", nonce=nonce)
 
 @bot.command()
+@_dedup_command("status")
 async def status(ctx):
-    nonce = ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(16))
-    logger.info(f"Status command received with nonce {nonce}")
-    message_key = (str(ctx.channel.id), "status", time.time() // 10)
-    if any(key == message_key for key, _ in sent_messages[str(ctx.channel.id)]):
-        logger.debug(f"Skipping duplicate status with nonce {nonce}")
-        return
-    sent_messages[str(ctx.channel.id)].append((message_key, nonce))
+    nonce = ctx.nonce
+    logger.info("Status command received with nonce %s", nonce)
     if not YOUTUBE_CHANNELS:
         await ctx.send("No YouTube channels are currently monitored.", nonce=nonce)
         return
+    channels = sorted(YOUTUBE_CHANNELS)
+    logger.info("Reattempting subscriptions for %s channels", len(channels))
+    results = await asyncio.gather(
+        *(subscribe_channel(channel_id) for channel_id in channels),
+        return_exceptions=True
+    )
     message = "Monitored YouTube channels:\n"
-    for channel_id in YOUTUBE_CHANNELS:
+    for channel_id, ok in zip(channels, results):
         message += f"- {channel_id}\n"
-        logger.info(f"Reattempting subscription for {channel_id}")
-        if subscribe_channel(channel_id):
+        if ok is True:
             message += f"  Subscription verified for {channel_id}\n"
         else:
             message += f"  Failed to verify subscription for {channel_id}\n"
     await ctx.send(message, nonce=nonce)
 
 @bot.command()
+@_dedup_command("testwebhook")
 async def testwebhook(ctx):
-    nonce = ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(16))
-    logger.info(f"Testwebhook command received with nonce {nonce}")
-    message_key = (str(ctx.channel.id), "testwebhook", time.time() // 10)
-    if any(key == message_key for key, _ in sent_messages[str(ctx.channel.id)]):
-        logger.debug(f"Skipping duplicate testwebhook with nonce {nonce}")
-        return
-    sent_messages[str(ctx.channel.id)].append((message_key, nonce))
+    nonce = ctx.nonce
+    logger.info("Testwebhook command received with nonce %s", nonce)
     retries = 3
     delay = 5
     last_error = None
     for attempt in range(retries):
         try:
-            xml_payload = '''<?xml version="1.0"?>
+            # Unique per invocation so repeat tests aren't swallowed by the
+            # process-lifetime video-id dedup in _dispatch
+            xml_payload = f'''<?xml version="1.0"?>
 <feed xmlns="http://www.w3.org/2005/Atom" xmlns:yt="http://www.youtube.com/xml/schemas/2015">
     <entry>
-        <yt:videoId>test123</yt:videoId>
+        <yt:videoId>test-{nonce}</yt:videoId>
         <title>Test Video</title>
     </entry>
 </feed>'''
-            logger.info(f"Attempting test webhook POST, attempt {attempt + 1}")
-            response = requests.post(
+            logger.info("Attempting test webhook POST, attempt %s", attempt + 1)
+            signature = hmac.new(HUB_SECRET.encode(), xml_payload.encode(), hashlib.sha1).hexdigest()
+            response = await client.post(
                 WEBHOOK_URL,
-                data=xml_payload,
-                headers={"Content-Type": "application/xml"},
-                timeout=15
+                content=xml_payload,
+                headers={
+                    "Content-Type": "application/xml",
+                    "X-Hub-Signature": f"sha1={signature}"
+                }
             )
-            logger.info(f"Test webhook response: status={response.status_code}, text={response.text}")
-            if response.status_code == 200:
+            logger.info("Test webhook response: status=%s, text=%s", response.status_code, response.text)
+            if response.status_code in (200, 204):
                 await ctx.send("Test webhook sent successfully. Check Discord channel for notification.", nonce=nonce)
                 return
             else:
                 await ctx.send(f"Test webhook failed: status={response.status_code}, response={response.text}", nonce=nonce)
                 if attempt < retries - 1:
-                    time.sleep(delay)
-        except requests.RequestException as e:
+                    await asyncio.sleep(delay)
+        except httpx.HTTPError as e:
             last_error = e
-            logger.error(f"Testwebhook failed with nonce {nonce}: {e}")
+            logger.error("Testwebhook failed with nonce %s: %s", nonce, e)
             if attempt < retries - 1:
-                time.sleep(delay)
+                await asyncio.sleep(delay)
     await ctx.send(f"Testwebhook failed after {retries} attempts: {last_error or 'Unknown error'}", nonce=nonce)
 
+async def _monitor_add(ctx, channel_id, nonce):
+    if channel_id in YOUTUBE_CHANNELS:
+        await ctx.send(f"Channel {channel_id} is already monitored", nonce=nonce)
+        logger.info("Channel %s already in YOUTUBE_CHANNELS", channel_id)
+        return
+    YOUTUBE_CHANNELS.add(channel_id)
+    save_accounts(YOUTUBE_CHANNELS)
+    if await subscribe_channel(channel_id):
+        await ctx.send(f"Successfully added YouTube channel {channel_id}", nonce=nonce)
+    else:
+        await ctx.send(f"Failed to subscribe to {channel_id} after retries. Check logs.", nonce=nonce)
+
+async def _monitor_remove(ctx, channel_id, nonce):
+    if channel_id not in YOUTUBE_CHANNELS:
+        await ctx.send(f"Channel {channel_id} is not monitored", nonce=nonce)
+        logger.info("Channel %s not in YOUTUBE_CHANNELS", channel_id)
+        return
+    YOUTUBE_CHANNELS.discard(channel_id)
+    save_accounts(YOUTUBE_CHANNELS)
+    try:
+        logger.info("Unsubscribing from YouTube channel %s", channel_id)
+        response = await client.post(
+            _HUB_URL,
+            data=_hub_payload("unsubscribe", channel_id)
+        )
+        logger.info("Unsubscribe response: status=%s, text=%s", response.status_code, response.text)
+        if response.status_code == 202:
+            await ctx.send(f"Successfully removed YouTube channel {channel_id}", nonce=nonce)
+        else:
+            await ctx.send(f"Unsubscribe request failed for {channel_id}. Check logs.", nonce=nonce)
+        logger.info("Unsubscribe request sent for %s", channel_id)
+    except Exception as e:
+        await ctx.send(f"Error unsubscribing from {channel_id}: {e}", nonce=nonce)
+        logger.error("Unsubscribe error for %s: %s", channel_id, e)
+
+_MONITOR_ACTIONS = {"add": _monitor_add, "remove": _monitor_remove}
+
 @bot.command()
+@_dedup_command("monitor")
 async def monitor(ctx, action: str, platform: str, channel_id: str):
-    nonce = ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(16))
-    logger.info(f"Monitor command: action={action}, platform={platform}, channel_id={channel_id}, nonce={nonce}")
-    message_key = (str(ctx.channel.id), f"monitor-{action}-{platform}-{channel_id}", time.time() // 10)
-    if any(key == message_key for key, _ in sent_messages[str(ctx.channel.id)]):
-        logger.debug(f"Skipping duplicate monitor with nonce {nonce}")
-        return
-    sent_messages[str(ctx.channel.id)].append((message_key, nonce))
-    if platform.lower() != "youtube":
+    action = action.lower()
+    platform = platform.lower()
+    nonce = ctx.nonce
+    logger.info("Monitor command: action=%s, platform=%s, channel_id=%s, nonce=%s", action, platform, channel_id, nonce)
+    if platform != "youtube":
         await ctx.send("Only YouTube is supported!", nonce=nonce)
-        logger.warning(f"Unsupported platform {platform}")
+        logger.warning("Unsupported platform %s", platform)
         return
-    if action.lower() == "add":
-        if channel_id in YOUTUBE_CHANNELS:
-            await ctx.send(f"Channel {channel_id} is already monitored", nonce=nonce)
-            logger.info(f"Channel {channel_id} already in YOUTUBE_CHANNELS")
-            return
-        YOUTUBE_CHANNELS.append(channel_id)
-        save_accounts(YOUTUBE_CHANNELS)
-        if subscribe_channel(channel_id):
-            await ctx.send(f"Successfully added YouTube channel {channel_id}", nonce=nonce)
-        else:
-            await ctx.send(f"Failed to subscribe to {channel_id} after retries. Check logs.", nonce=nonce)
-    elif action.lower() == "remove":
-        if channel_id not in YOUTUBE_CHANNELS:
-            await ctx.send(f"Channel {channel_id} is not monitored", nonce=nonce)
-            logger.info(f"Channel {channel_id} not in YOUTUBE_CHANNELS")
-            return
-        YOUTUBE_CHANNELS.remove(channel_id)
-        save_accounts(YOUTUBE_CHANNELS)
-        try:
-            logger.info(f"Unsubscribing from YouTube channel {channel_id}")
-            response = requests.post(
-                "https://pubsubhubbub.appspot.com/subscribe",
-                data={
-                    "hub.mode": "unsubscribe",
-                    "hub.topic": f"https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}",
-                    "hub.callback": WEBHOOK_URL
-                },
-                timeout=15
-            )
-            logger.info(f"Unsubscribe response: status={response.status_code}, text={response.text}")
-            if response.status_code == 202:
-                await ctx.send(f"Successfully removed YouTube channel {channel_id}", nonce=nonce)
-            else:
-                await ctx.send(f"Unsubscribe request failed for {channel_id}. Check logs.", nonce=nonce)
-            logger.info(f"Unsubscribe request sent for {channel_id}")
-        except Exception as e:
-            await ctx.send(f"Error unsubscribing from {channel_id}: {e}", nonce=nonce)
-            logger.error(f"Unsubscribe error for {channel_id}: {e}")
-    else:
+    handler = _MONITOR_ACTIONS.get(action)
+    if handler is None:
         await ctx.send("Invalid action. Use 'add' or 'remove'.", nonce=nonce)
-        logger.warning(f"Invalid action {action}")
+        logger.warning("Invalid action %s", action)
+        return
+    await handler(ctx, channel_id, nonce)
 
 @app.get("/webhook")
 async def webhook_verify(request: Request, hub_challenge: str = Query(..., alias="hub.challenge")):
-    logger.info(f"Received webhook verification: hub.challenge={hub_challenge}")
-    return hub_challenge
+    logger.info("Received webhook verification: hub.challenge=%s", hub_challenge)
+    # The hub expects the challenge echoed back verbatim, not JSON-quoted
+    return PlainTextResponse(hub_challenge)
 
-@app.post("/webhook")
-async def handle_webhook(request: Request):
-    logger.info("Received webhook POST request")
-    try:
-        xml_data = await request.body()
-        xml_str = xml_data.decode('utf-8')
-        logger.info(f"Webhook XML payload: {xml_str}")
-        namespaces = {
-            'atom': 'http://www.w3.org/2005/Atom',
-            'yt': 'http://www.youtube.com/xml/schemas/2015'
-        }
-        root = ET.fromstring(xml_str)
-        video_id_elem = root.find(".//yt:videoId", namespaces)
-        title_elem = root.find(".//atom:title", namespaces)
-        if video_id_elem is None or title_elem is None:
-            logger.error("Missing videoId or title in webhook XML")
-            return {"status": "error", "message": "Invalid webhook data"}
-        video_id = video_id_elem.text
-        title = title_elem.text
-        logger.info(f"Parsed new video: title={title}, video_id={video_id}")
-        channel = bot.get_channel(CHANNEL_ID)
-        if channel:
+# Bound the fan-out to Discord when the hub delivers a burst of notifications
+_dispatch_semaphore = asyncio.Semaphore(50)
+
+# The hub retransmits notifications aggressively; remember the last N video
+# ids so repeats never reach Discord
+_seen_videos = OrderedDict()
+
+def _parse_notification(xml_data):
+    # Full lxml parse plus element lookups, done in one function so the whole
+    # fallback can be offloaded to a worker thread in a single hop
+    root = ET.fromstring(xml_data, _PARSER)
+    video_id_elem = next(root.iter(_VIDEO_TAG), None)
+    title_elem = next(root.iter(_TITLE_TAG), None)
+    if video_id_elem is None or title_elem is None:
+        return None
+    return video_id_elem.text, title_elem.text
+
+def _dedupe_video(video_id, cap=512):
+    if video_id in _seen_videos:
+        return True
+    _seen_videos[video_id] = None
+    if len(_seen_videos) > cap:
+        _seen_videos.popitem(last=False)
+    return False
+
+async def _dispatch(xml_data):
+    async with _dispatch_semaphore:
+        try:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Webhook XML payload: %s", xml_data)
+            m = _FAST.search(xml_data)
+            if m:
+                # The regex captures still-escaped XML text; unescape so the
+                # fast path matches what the lxml fallback returns
+                video_id = unescape(m.group(1).decode(), _XML_ENTITIES)
+                title = unescape(m.group(2).decode(), _XML_ENTITIES)
+            else:
+                parsed = await asyncio.to_thread(_parse_notification, xml_data)
+                if parsed is None:
+                    logger.error("Missing videoId or title in webhook XML")
+                    return
+                video_id, title = parsed
+            if _dedupe_video(video_id):
+                logger.debug("Skipping retransmitted notification for video %s", video_id)
+                return
+            logger.info("Parsed new video: title=%s, video_id=%s", title, video_id)
             message = f"New YouTube video: {title}\nhttps://www.youtube.com/watch?v={video_id}"
-            logger.info(f"Sending notification to channel {CHANNEL_ID}: {message}")
-            nonce = ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(16))
-            message_key = (str(channel.id), f"notification-{video_id}", time.time() // 10)
-            if any(key == message_key for key, _ in sent_messages[str(channel.id)]):
-                logger.debug(f"Skipping duplicate notification with nonce {nonce}")
-                return {"status": "ok"}
-            sent_messages[str(channel.id)].append((message_key, nonce))
-            await channel.send(message, nonce=nonce)
-            logger.info(f"Sent notification for video {video_id} to channel {CHANNEL_ID}")
-        else:
-            logger.error(f"Cannot send notification: Discord channel {CHANNEL_ID} not found")
-        return {"status": "ok"}
-    except ET.ParseError as e:
-        logger.error(f"Failed to parse webhook XML: {e}")
-        logger.info(f"Invalid XML payload: {xml_str}")
-        return {"status": "error", "message": "Invalid XML"}
-    except Exception as e:
-        logger.error(f"Webhook processing error: {e}")
-        return {"status": "error", "message": str(e)}
+            if DISCORD_WEBHOOK_URL:
+                response = await client.post(DISCORD_WEBHOOK_URL, json={"content": message})
+                if response.status_code >= 400:
+                    logger.error("Discord webhook post failed for video %s: status=%s", video_id, response.status_code)
+                else:
+                    logger.info("Sent notification for video %s via Discord webhook", video_id)
+                return
+            channel = _target_channel or bot.get_channel(CHANNEL_ID)
+            if channel:
+                logger.info("Sending notification to channel %s: %s", CHANNEL_ID, message)
+                nonce = _nonce()
+                message_key = (str(channel.id), f"notification-{video_id}", _bucket())
+                if message_key in sent_messages[str(channel.id)]:
+                    logger.debug("Skipping duplicate notification with nonce %s", nonce)
+                    return
+                sent_messages[str(channel.id)][message_key] = nonce
+                await channel.send(message, nonce=nonce)
+                logger.info("Sent notification for video %s to channel %s", video_id, CHANNEL_ID)
+            else:
+                logger.error("Cannot send notification: Discord channel %s not found", CHANNEL_ID)
+        except ET.XMLSyntaxError as e:
+            logger.error("Failed to parse webhook XML: %s", e)
+            logger.debug("Invalid XML payload: %s", xml_data)
+        except Exception as e:
+            logger.error("Webhook processing error: %s", e)
 
-@app.on_event("startup")
-async def startup_event():
-    logger.info("Starting FastAPI server and Discord bot")
-    asyncio.create_task(bot.start(DISCORD_TOKEN))
+# A real PubSubHubbub body is well under 4 KiB; anything bigger is junk and
+# gets rejected before it can occupy memory or the parser
+_MAX_BODY = 64 * 1024
 
-@app.on_event("shutdown")
-async def shutdown_event():
-    logger.info("Shutting down Discord bot")
-    await bot.close()
+@app.post("/webhook")
+async def handle_webhook(request: Request):
+    logger.info("Received webhook POST request")
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > _MAX_BODY:
+        return Response(status_code=413)
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > _MAX_BODY:
+            logger.warning("Webhook body exceeded %s bytes, dropping", _MAX_BODY)
+            return Response(status_code=413)
+        chunks.append(chunk)
+    xml_data = b"".join(chunks)
+    if not _verify_signature(request.headers.get("x-hub-signature", ""), xml_data):
+        logger.warning("Rejected webhook with missing or invalid X-Hub-Signature")
+        return Response(status_code=204)
+    # Acknowledge the hub immediately; parsing and the Discord send happen in
+    # the background so hub-visible latency is just the body read
+    asyncio.create_task(_dispatch(xml_data))
+    return Response(status_code=204)
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # WEB_CONCURRENCY defaults to 1: the bot connection, dedup caches, and
+    # channel set all live in-process, so extra workers only make sense for a
+    # webhook-only deployment (DISCORD_WEBHOOK_URL with dedup moved out)
+    uvicorn.run(
+        "youtube_webhook:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+        log_level="warning",
+        access_log=False
+    )